@@ -1,79 +1,106 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import falcon
+from falcon import media
 from sql_analyzer import SQLAnalyzer
 import logging
+import os
+import orjson
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
 # Initialize SQL analyzer
 sql_analyzer = SQLAnalyzer()
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({"status": "healthy", "service": "sql-optimizer-backend"})
-
-@app.route('/analyze-query', methods=['POST'])
-def analyze_query():
-    """
-    Analyze and optimize SQL query endpoint
-    
-    Expected JSON payload:
-    {
-        "query": "SELECT * FROM users WHERE id = 1"
-    }
-    
-    Returns:
-    {
-        "errors": ["list of syntax errors"],
-        "warnings": ["list of warnings/bad practices"],
-        "optimized_query": "optimized version of the query"
-    }
-    """
-    try:
-        # Get request data
-        data = request.get_json()
-        
-        if not data or 'query' not in data:
-            return jsonify({
-                "error": "Missing 'query' field in request body"
-            }), 400
-        
-        query = data['query'].strip()
-        
-        if not query:
-            return jsonify({
-                "error": "Query cannot be empty"
-            }), 400
-        
-        logger.info(f"Analyzing query: {query[:100]}...")
-        
-        # Analyze the SQL query
-        result = sql_analyzer.analyze_query(query)
-        
-        logger.info(f"Analysis completed successfully")
-        
-        return jsonify(result)
-        
-    except Exception as e:
-        logger.error(f"Error analyzing query: {str(e)}")
-        return jsonify({
-            "error": "Internal server error during query analysis",
-            "details": str(e)
-        }), 500
-
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({"error": "Internal server error"}), 500
+class HealthResource:
+    def on_get(self, req, resp):
+        """Health check endpoint"""
+        resp.media = {"status": "healthy", "service": "sql-optimizer-backend"}
+
+class CacheInfoResource:
+    def on_get(self, req, resp):
+        """Analysis cache statistics endpoint"""
+        # Each gunicorn worker has its own cache, so report which one answered
+        resp.media = {**sql_analyzer.cache_info()._asdict(), "pid": os.getpid()}
+
+class AnalyzeQueryResource:
+    def on_post(self, req, resp):
+        """
+        Analyze and optimize SQL query endpoint
+
+        Expected JSON payload:
+        {
+            "query": "SELECT * FROM users WHERE id = 1"
+        }
+
+        Returns:
+        {
+            "errors": ["list of syntax errors"],
+            "warnings": ["list of warnings/bad practices"],
+            "optimized_query": "optimized version of the query"
+        }
+        """
+        # Malformed JSON is rejected by Falcon with a 400 response
+        data = req.get_media(default_when_empty=None)
+
+        try:
+            if not data or 'query' not in data:
+                resp.status = falcon.HTTP_400
+                resp.media = {
+                    "error": "Missing 'query' field in request body"
+                }
+                return
+
+            query = data['query'].strip()
+
+            if not query:
+                resp.status = falcon.HTTP_400
+                resp.media = {
+                    "error": "Query cannot be empty"
+                }
+                return
+
+            logger.info(f"Analyzing query: {query[:100]}...")
+
+            # Analyze the SQL query
+            resp.media = sql_analyzer.analyze_query(query)
+
+            logger.info(f"Analysis completed successfully")
+
+        except Exception as e:
+            logger.error(f"Error analyzing query: {str(e)}")
+            resp.status = falcon.HTTP_500
+            resp.media = {
+                "error": "Internal server error during query analysis",
+                "details": str(e)
+            }
+
+def not_found(req, resp, ex, params):
+    resp.status = falcon.HTTP_404
+    resp.media = {"error": "Endpoint not found"}
+
+def internal_error(req, resp, ex, params):
+    logger.error(f"Unhandled error: {str(ex)}")
+    resp.status = falcon.HTTP_500
+    resp.media = {"error": "Internal server error"}
+
+# Serialize request and response bodies with orjson
+json_handler = media.JSONHandler(dumps=orjson.dumps, loads=orjson.loads)
+
+app = falcon.App(cors_enable=True)
+app.req_options.media_handlers[falcon.MEDIA_JSON] = json_handler
+app.resp_options.media_handlers[falcon.MEDIA_JSON] = json_handler
+
+app.add_route('/health', HealthResource())
+app.add_route('/cache-info', CacheInfoResource())
+app.add_route('/analyze-query', AnalyzeQueryResource())
+
+app.add_error_handler(Exception, internal_error)
+app.add_error_handler(falcon.HTTPNotFound, not_found)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
+    from wsgiref.simple_server import make_server
+
+    # Development server; use gunicorn.conf.py for anything else
+    with make_server('0.0.0.0', 5001, app) as httpd:
+        httpd.serve_forever()
@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration for the SQL Optimizer backend
+
+Run with:
+    gunicorn -c gunicorn.conf.py 'app:app'
+"""
+
+import multiprocessing
+
+# Listen on the same port as the development server
+bind = "0.0.0.0:5001"
+
+# Worker processes
+workers = (2 * multiprocessing.cpu_count()) + 1
+worker_class = "gevent"
+worker_connections = 1000
+keepalive = 5
+
+# Load the app (compiled patterns, SQLAnalyzer instance) once in the master
+# so forked workers share that memory copy-on-write; each worker still keeps
+# its own analysis cache
+preload_app = True
@@ -1,9 +1,105 @@
-import sqlparse
-import sqlglot
-from sqlglot import parse, exp
+from sqlglot import parse
 from sqlglot.errors import ParseError
+import io
 import re
-from typing import Dict, List, Tuple, Optional
+import string
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Callable, ClassVar, Dict, Iterator, List, Tuple, Optional
+
+# Token kinds produced by SQLAnalyzer._tokenize
+KEYWORD = 'KEYWORD'
+IDENT = 'IDENT'
+NUMBER = 'NUMBER'
+STRING = 'STRING'
+PUNCT = 'PUNCT'
+WHITESPACE = 'WHITESPACE'
+
+# Identifier runs that are reported as KEYWORD tokens
+_KEYWORDS = frozenset({
+    'SELECT', 'FROM', 'WHERE', 'ORDER', 'GROUP', 'BY', 'HAVING', 'LIMIT',
+    'OFFSET', 'DISTINCT', 'IN', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER',
+    'FULL', 'CROSS', 'ON', 'AS', 'AND', 'OR', 'NOT', 'IS', 'NULL', 'LIKE',
+    'BETWEEN', 'EXISTS', 'UNION', 'ALL', 'WITH', 'INSERT', 'INTO', 'VALUES',
+    'UPDATE', 'SET', 'DELETE', 'CREATE', 'ALTER', 'DROP', 'CASE', 'WHEN',
+    'THEN', 'ELSE', 'END', 'ASC', 'DESC',
+})
+
+# Tokens that cannot end a complete statement
+_DANGLING_TOKENS = frozenset({
+    ',', '(', '=', '<', '>', '+', '-', '/', 'SELECT', 'FROM', 'WHERE', 'AND',
+    'OR', 'NOT', 'ON', 'BY', 'JOIN', 'SET', 'IN', 'LIKE', 'BETWEEN', 'AS',
+})
+
+# One alternation covering every token kind, so tokenizing is a single regex
+# pass; group names match the token kinds except WORD (keyword or identifier)
+# and QUOTED (a quoted identifier). PUNCT matches any remaining character.
+_TOKEN_RE = re.compile(r"""
+    (?P<WHITESPACE>\s+|--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<WORD>[^\W\d]\w*)
+  | (?P<NUMBER>\d[\d.]*)
+  | (?P<STRING>'(?:[^']+|'')*'?)
+  | (?P<QUOTED>"(?:[^"]+|"")*"?|`(?:[^`]+|``)*`?)
+  | (?P<PUNCT>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Token kinds accepted as the value of a "column = value" WHERE predicate
+_EQUALITY_VALUE_KINDS = (IDENT, NUMBER)
+
+# ASCII-only upper-casing keeps offsets in the upper-cased copy aligned with the query
+_ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+# Precompiled patterns shared by the optimization rules. They are matched against
+# the upper-cased query, so none of them needs re.IGNORECASE.
+_SELECT_STAR_RE = re.compile(r'SELECT\s+\*')
+# The FROM terminator is a lookahead so replacements only cover the column list
+_SELECT_COLS_RE = re.compile(r'\bSELECT\s+(.+?)(?=\s+FROM\b)', re.DOTALL)
+_DISTINCT_PREFIX_RE = re.compile(r'\bDISTINCT\s+')
+
+# Table aliases handed out in order: a, b, c, etc.
+_ALIASES = tuple(string.ascii_lowercase)
+
+# Replacement templates
+_SELECT_COLUMNS_TEMPLATE = 'SELECT {columns}'
+_SELECT_APPEND_TEMPLATE = 'SELECT {columns}, {column}'
+
+
+@dataclass
+class QueryShape:
+    """Structural facts about a query collected in a single tokenizer pass"""
+    select_cols: Optional[str] = None
+    select_star: bool = False
+    from_tables: List[str] = field(default_factory=list)
+    join_tables: List[str] = field(default_factory=list)
+    table_refs: List[Tuple[str, int]] = field(default_factory=list)
+    has_alias: bool = False
+    where_exists: bool = False
+    has_where_equality_predicate: bool = False
+    has_where_key_equality: bool = False
+    where_col: Optional[str] = None
+    where_cols: List[str] = field(default_factory=list)
+    order_by_exists: bool = False
+    order_by_cols: List[str] = field(default_factory=list)
+    has_limit: bool = False
+    has_distinct: bool = False
+    # (column, values, (start, end) of "IN (...)", preceded by NOT)
+    in_clauses: List[Tuple[Optional[str], List[str], Tuple[int, int], bool]] = field(default_factory=list)
+    is_delete_or_update: bool = False
+    # Some DELETE/UPDATE statement has no top-level WHERE
+    has_unfiltered_write: bool = False
+
+# A rule's rewrite: replace ctx.query[start:end] with the given text
+Edit = Tuple[int, int, str]
+
+
+@dataclass
+class RuleContext:
+    """Per-query inputs shared by every optimization rule"""
+    query: str
+    query_upper: str
+    shape: QueryShape
+
 
 class SQLAnalyzer:
     """
@@ -15,17 +111,16 @@ class SQLAnalyzer:
     - Query optimization suggestions
     """
     
-    def __init__(self):
-        """Initialize the SQL analyzer with optimization rules"""
-        self.optimization_rules = [
-            self._rule_select_star,
-            self._rule_missing_where,
-            self._rule_in_clause_optimization,
-            self._rule_order_by_limit,
-            self._rule_unnecessary_distinct,
-            self._rule_table_aliases,
-            self._rule_index_hints
-        ]
+    # Lower-case table name -> (columns added to referenced ones, default columns)
+    _TABLE_COLUMN_PROFILE = {
+        'users': (('id', 'name', 'email', 'number'), ('id', 'name', 'email', 'created_at')),
+        'orders': (('id', 'user_id', 'total', 'status'), ('id', 'user_id', 'total', 'status', 'created_at')),
+        'products': (('id', 'name', 'price', 'category'), ('id', 'name', 'price', 'category', 'stock')),
+    }
+    _GENERIC_PROFILE = (('id', 'name'), ('id', 'name'))
+    
+    # The analyzer is stateless; rules are registered in _OPTIMIZATION_RULES below
+    __slots__ = ()
     
     def analyze_query(self, query: str) -> Dict[str, List[str]]:
         """
@@ -37,6 +132,44 @@ class SQLAnalyzer:
         Returns:
             Dict containing errors, warnings, and optimized query
         """
+        # Queries differing only in whitespace share one cached analysis
+        cache_key = self._cache_key(query)
+        errors, warnings, optimized_query = _analyze_cached(cache_key)
+        if optimized_query == cache_key:
+            # No rule rewrote it, so hand back the caller's own layout
+            optimized_query = query.strip()
+        return {
+            "errors": list(errors),
+            "warnings": list(warnings),
+            "optimized_query": optimized_query
+        }
+    
+    def _cache_key(self, query: str) -> str:
+        """
+        Collapse the whitespace between tokens to build the analysis cache key
+        
+        String literals, quoted identifiers and comments are kept verbatim, and
+        the whitespace after a line comment collapses to the newline ending it.
+        """
+        parts = []
+        line_comment = False
+        for kind, value, start, end in self._tokenize(query):
+            if kind != WHITESPACE or value.startswith(('--', '/*')):
+                # Keyword values are upper-cased, so copy the original text
+                parts.append(query[start:end])
+                line_comment = value.startswith('--')
+            else:
+                parts.append('\n' if line_comment else ' ')
+                line_comment = False
+        return ''.join(parts).strip()
+    
+    @staticmethod
+    def cache_info():
+        """Return hit/miss statistics of the analysis cache"""
+        return _analyze_cached.cache_info()
+    
+    def _analyze(self, query: str) -> Dict[str, List[str]]:
+        """Run syntax validation and the optimization rules without caching"""
         result = {
             "errors": [],
             "warnings": [],
@@ -58,10 +191,15 @@ class SQLAnalyzer:
         return result
     
     def _validate_syntax(self, query: str, result: Dict[str, List[str]]) -> None:
-        """Validate SQL syntax using sqlglot"""
+        """Validate SQL syntax using cheap structural checks, then sqlglot"""
+        structural_error = self._prevalidate(query)
+        if structural_error:
+            result["errors"].append(f"SQL syntax error: {structural_error}")
+            return
+        
         try:
             # Try to parse with sqlglot
-            parsed = parse(query)
+            parsed = _parse_cached(query)
             if not parsed:
                 result["errors"].append("Unable to parse SQL query - check syntax")
         except ParseError as e:
@@ -69,84 +207,271 @@ class SQLAnalyzer:
         except Exception as e:
             result["errors"].append(f"Unexpected parsing error: {str(e)}")
     
+    def _prevalidate(self, query: str) -> Optional[str]:
+        """Reject structurally broken queries without invoking the sqlglot parser"""
+        tokens = [(kind, value) for kind, value, _, _ in self._tokenize(query) if kind != WHITESPACE]
+        if not tokens:
+            return None
+        
+        depth = 0
+        for kind, value in tokens:
+            if kind == PUNCT and value == '(':
+                depth += 1
+            elif kind == PUNCT and value == ')':
+                depth -= 1
+                if depth < 0:
+                    return "unbalanced parentheses"
+        if depth:
+            return "unbalanced parentheses"
+        
+        for previous, current in zip(tokens, tokens[1:]):
+            if previous == (KEYWORD, 'SELECT') and current == (KEYWORD, 'FROM'):
+                return "SELECT has no columns"
+        
+        while tokens and tokens[-1] == (PUNCT, ';'):
+            tokens.pop()
+        if tokens and tokens[-1][0] in (KEYWORD, PUNCT) and tokens[-1][1] in _DANGLING_TOKENS:
+            return f"query ends unexpectedly after '{tokens[-1][1]}'"
+        
+        return None
+    
     def _apply_optimization_rules(self, query: str, result: Dict[str, List[str]]) -> str:
         """Apply all optimization rules to the query and return optimized version"""
-        optimized_query = query
+        ctx = self._rule_context(query)
+        pending_edits = []  # Edits against ctx.query, applied together at the end
         
         # Apply rules in specific order and accumulate changes
-        for rule in self.optimization_rules:
+        for rule in SQLAnalyzer._OPTIMIZATION_RULES:
             try:
-                rule_result = rule(optimized_query)  # Use the current optimized version
+                rule_result = rule(self, ctx)
+                if rule_result and rule_result[1] and self._edits_conflict(pending_edits, rule_result[1]):
+                    # The rule rewrites text an earlier rule already changed, so
+                    # materialize the pending edits and let it see the current version
+                    ctx = self._rule_context(self._apply_edits(ctx.query, pending_edits))
+                    pending_edits = []
+                    rule_result = rule(self, ctx)
                 if rule_result:
-                    warning, suggestion = rule_result
+                    warning, edits = rule_result
                     result["warnings"].append(warning)
-                    if suggestion:
-                        optimized_query = suggestion  # Update with the new optimization
+                    if edits:
+                        pending_edits.extend(edits)
             except Exception as e:
                 # Log rule execution errors but don't fail the analysis
                 continue
         
-        return optimized_query
+        return self._apply_edits(ctx.query, pending_edits)
+    
+    def _edits_conflict(self, pending_edits: List[Edit], edits: List[Edit]) -> bool:
+        """Check whether any new edit overlaps or touches a pending one"""
+        return any(
+            start <= pending_end and pending_start <= end
+            for start, end, _ in edits
+            for pending_start, pending_end, _ in pending_edits
+        )
+    
+    def _apply_edits(self, query: str, edits: List[Edit]) -> str:
+        """Build the edited query in one pass from non-overlapping (start, end, replacement) edits"""
+        if not edits:
+            return query
+        parts = []
+        last_end = 0
+        for start, end, replacement in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+            parts.append(query[last_end:start])
+            parts.append(replacement)
+            last_end = end
+        parts.append(query[last_end:])
+        return ''.join(parts)
+    
+    def _rule_context(self, query: str) -> RuleContext:
+        """Upper-case and scan a query once for all the rules that inspect it"""
+        return RuleContext(query, query.translate(_ASCII_UPPER), self._scan(query))
+    
+    def _tokenize(self, query: str) -> Iterator[Tuple[str, str, int, int]]:
+        """
+        Split a query into (kind, value, start, end) tokens in a single pass
+        
+        Keyword values are upper-cased; every other value is the raw query text.
+        Comments are reported as WHITESPACE and double-quoted or backticked
+        names as IDENT.
+        """
+        for match in _TOKEN_RE.finditer(query):
+            kind = match.lastgroup
+            value = match.group()
+            if kind == 'WORD':
+                word = value.upper()
+                if word in _KEYWORDS:
+                    yield KEYWORD, word, match.start(), match.end()
+                    continue
+                kind = IDENT
+            elif kind == 'QUOTED':
+                kind = IDENT
+            yield kind, value, match.start(), match.end()
+    
+    def _scan(self, query: str) -> QueryShape:
+        """Collect the QueryShape consumed by the optimization rules"""
+        shape = QueryShape()
+        prev = (None, None)
+        before_prev = (None, None)
+        depth = 0
+        select_end = None
+        select_depth = 0
+        pending_in = None
+        open_in = None
+        predicate = None
+        with_statement = False
+        write_statement = False
+        write_where = False
+        
+        for kind, value, start, end in self._tokenize(query):
+            if kind == WHITESPACE:
+                continue
+            
+            if predicate is not None:
+                # First tokens after WHERE: "column = value" or "table.column = value"
+                predicate.append(value if kind == PUNCT else kind)
+                if len(predicate) == 3:
+                    if predicate[:2] == [IDENT, '='] and predicate[2] in _EQUALITY_VALUE_KINDS:
+                        shape.has_where_equality_predicate = True
+                elif len(predicate) == 5:
+                    if predicate == [IDENT, '.', IDENT, '=', NUMBER]:
+                        shape.has_where_key_equality = True
+                    predicate = None
+            
+            if pending_in is not None:
+                # IN only opens a value list when directly followed by "("
+                if kind == PUNCT and value == '(':
+                    column, in_start, negated = pending_in
+                    open_in = (column, [], in_start, end, depth + 1, negated)
+                pending_in = None
+            
+            if kind == PUNCT:
+                if value == '(':
+                    depth += 1
+                elif value in ',)' and open_in is not None and depth == open_in[4]:
+                    column, values, in_start, segment_start, in_depth, negated = open_in
+                    segment = query[segment_start:start].strip()
+                    if segment:
+                        values.append(segment)
+                    if value == ',':
+                        open_in = (column, values, in_start, end, in_depth, negated)
+                    else:
+                        if values:
+                            shape.in_clauses.append((column, values, (in_start, end), negated))
+                        open_in = None
+                if value == ')':
+                    depth -= 1
+                elif value == '*' and prev == (KEYWORD, 'SELECT'):
+                    shape.select_star = True
+                elif value == ';':
+                    # Statement boundary: settle the WHERE check of the one that ended
+                    if write_statement and not write_where:
+                        shape.has_unfiltered_write = True
+                    with_statement = write_statement = False
+            
+            elif kind == KEYWORD:
+                statement_start = prev[0] is None or prev == (PUNCT, ';')
+                if value == 'WITH' and statement_start:
+                    with_statement = True
+                elif value in ('DELETE', 'UPDATE') and (
+                        statement_start or (with_statement and depth == 0 and prev == (PUNCT, ')'))):
+                    # A write starting the statement or following its CTE definitions
+                    shape.is_delete_or_update = True
+                    write_statement = True
+                    write_where = False
+                if value == 'SELECT':
+                    if select_end is None:
+                        select_end = end
+                        select_depth = depth
+                elif value == 'FROM':
+                    if select_end is not None and shape.select_cols is None and depth == select_depth:
+                        shape.select_cols = query[select_end:start].strip()
+                elif value == 'WHERE':
+                    shape.where_exists = True
+                    if write_statement and depth == 0:
+                        write_where = True
+                    predicate = []
+                elif value == 'BY':
+                    if prev == (KEYWORD, 'ORDER'):
+                        shape.order_by_exists = True
+                elif value == 'LIMIT':
+                    shape.has_limit = True
+                elif value == 'DISTINCT':
+                    shape.has_distinct = True
+                elif value == 'IN':
+                    negated = prev == (KEYWORD, 'NOT')
+                    column_token = before_prev if negated else prev
+                    pending_in = (column_token[1] if column_token[0] == IDENT else None, start, negated)
+            
+            elif kind == IDENT and prev[0] == KEYWORD:
+                if prev[1] == 'FROM':
+                    shape.from_tables.append(value)
+                    shape.table_refs.append((value, end))
+                elif prev[1] == 'JOIN':
+                    shape.join_tables.append(value)
+                    shape.table_refs.append((value, end))
+                elif prev[1] == 'AS':
+                    shape.has_alias = True
+                elif prev[1] == 'WHERE':
+                    shape.where_cols.append(value)
+                    if shape.where_col is None:
+                        shape.where_col = value
+                elif prev[1] == 'BY' and before_prev == (KEYWORD, 'ORDER'):
+                    shape.order_by_cols.append(value)
+            
+            before_prev = prev
+            prev = (kind, value)
+        
+        if write_statement and not write_where:
+            shape.has_unfiltered_write = True
+        
+        return shape
     
-    def _rule_select_star(self, query: str) -> Optional[Tuple[str, str]]:
+    def _substitute(self, pattern: re.Pattern, ctx: RuleContext,
+                    replace: Callable[[re.Match], str]) -> List[Edit]:
+        """
+        Edit every match of pattern in ctx.query_upper at the same span of ctx.query
+        
+        Text outside the matches keeps its original case; replace receives each match and
+        can slice the original query with the match spans.
+        """
+        return [(match.start(), match.end(), replace(match)) for match in pattern.finditer(ctx.query_upper)]
+    
+    def _rule_select_star(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Detect SELECT * usage and suggest specific columns"""
-        if re.search(r'SELECT\s+\*', query, re.IGNORECASE | re.DOTALL):
+        if ctx.shape.select_star:
             # Try to extract table name to suggest common columns
-            table_match = re.search(r'FROM\s+(\w+)', query, re.IGNORECASE | re.DOTALL)
-            if table_match:
-                table_name = table_match.group(1)
+            if ctx.shape.from_tables:
+                table_name = ctx.shape.from_tables[0]
                 
                 # Check if there are specific columns mentioned in WHERE or ORDER BY
-                where_columns = re.findall(r'WHERE\s+(\w+)', query, re.IGNORECASE | re.DOTALL)
-                order_columns = re.findall(r'ORDER\s+BY\s+(\w+)', query, re.IGNORECASE | re.DOTALL)
+                where_columns = ctx.shape.where_cols
+                order_columns = ctx.shape.order_by_cols
                 
-                # Combine all referenced columns
-                referenced_columns = set()
-                if where_columns:
-                    referenced_columns.update(where_columns)
-                if order_columns:
-                    referenced_columns.update(order_columns)
+                # Combine all referenced columns, in query order
+                referenced_columns = where_columns + order_columns
                 
                 # Suggest columns based on table and context
-                if table_name.lower() == 'users':
-                    # For users table, prioritize commonly needed columns
-                    if referenced_columns:
-                        # Include referenced columns plus common ones
-                        suggested_columns = list(referenced_columns) + ['id', 'name', 'email', 'number']
-                        suggested_columns = list(dict.fromkeys(suggested_columns))  # Remove duplicates
-                    else:
-                        # Default suggestion for users table
-                        suggested_columns = ['id', 'name', 'email', 'created_at']
-                        
-                elif table_name.lower() == 'orders':
-                    if referenced_columns:
-                        suggested_columns = list(referenced_columns) + ['id', 'user_id', 'total', 'status']
-                        suggested_columns = list(dict.fromkeys(suggested_columns))
-                    else:
-                        suggested_columns = ['id', 'user_id', 'total', 'status', 'created_at']
-                        
-                elif table_name.lower() == 'products':
-                    if referenced_columns:
-                        suggested_columns = list(referenced_columns) + ['id', 'name', 'price', 'category']
-                        suggested_columns = list(dict.fromkeys(suggested_columns))
-                    else:
-                        suggested_columns = ['id', 'name', 'price', 'category', 'stock']
-                        
+                extra_columns, default_columns = self._TABLE_COLUMN_PROFILE.get(
+                    table_name.lower(), self._GENERIC_PROFILE
+                )
+                if referenced_columns:
+                    # Include referenced columns plus common ones, without duplicates
+                    seen = set()
+                    suggested_columns = [
+                        column for column in chain(referenced_columns, extra_columns)
+                        if column not in seen and not seen.add(column)
+                    ]
                 else:
-                    # Generic suggestion based on referenced columns
-                    if referenced_columns:
-                        suggested_columns = list(referenced_columns) + ['id', 'name']
-                        suggested_columns = list(dict.fromkeys(suggested_columns))
-                    else:
-                        suggested_columns = ['id', 'name']
+                    suggested_columns = default_columns
                 
                 # Create optimized query
                 columns_str = ', '.join(suggested_columns)
-                optimized = re.sub(r'SELECT\s+\*', f'SELECT {columns_str}', query, flags=re.IGNORECASE | re.DOTALL)
+                select_sql = _SELECT_COLUMNS_TEMPLATE.format(columns=columns_str)
+                edits = self._substitute(_SELECT_STAR_RE, ctx, lambda match: select_sql)
                 
                 return (
                     f"SELECT * is used - consider specifying only needed columns for better performance. Suggested: {columns_str}",
-                    optimized
+                    edits
                 )
             else:
                 return (
@@ -155,88 +480,83 @@ class SQLAnalyzer:
                 )
         return None
     
-    def _rule_missing_where(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_missing_where(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Detect DELETE/UPDATE without WHERE clause"""
-        if re.search(r'\b(DELETE|UPDATE)\s+FROM?\s+\w+', query, re.IGNORECASE):
-            if not re.search(r'\bWHERE\b', query, re.IGNORECASE):
-                return (
-                    "DELETE/UPDATE statement missing WHERE clause - this could affect all rows",
-                    None
-                )
-        return None
+        # The shared scan checks each DELETE/UPDATE statement for a WHERE keyword
+        # token, so identifiers like "nowhere" don't count
+        if not ctx.shape.has_unfiltered_write:
+            return None
+        return (
+            "DELETE/UPDATE statement missing WHERE clause - this could affect all rows",
+            None
+        )
     
-    def _rule_in_clause_optimization(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_in_clause_optimization(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Detect large IN clauses and suggest alternatives"""
-        in_match = re.search(r'\bIN\s*\(([^)]+)\)', query, re.IGNORECASE)
-        if in_match:
-            values = in_match.group(1).split(',')
+        if ctx.shape.in_clauses:
+            in_column, values, (in_start, in_end), negated = ctx.shape.in_clauses[0]
             if len(values) > 10:
                 # Check if values are sequential (can use BETWEEN)
                 try:
-                    numeric_values = [int(v.strip()) for v in values if v.strip().isdigit()]
-                    if len(numeric_values) == len(values):
-                        numeric_values.sort()
-                        if numeric_values[-1] - numeric_values[0] + 1 == len(numeric_values):
+                    # One pass over the values, stopping at the first non-numeric one
+                    numeric_values = []
+                    for value in values:
+                        if not value.isdigit():
+                            break
+                        numeric_values.append(int(value))
+                    else:
+                        low, high = min(numeric_values), max(numeric_values)
+                        if high - low + 1 == len(numeric_values) == len(set(numeric_values)):
                             # Sequential range - suggest BETWEEN
-                            column_match = re.search(r'\bWHERE\s+(\w+)', query, re.IGNORECASE)
-                            if column_match:
-                                column_name = column_match.group(1)
-                                
-                                # Create optimized query with BETWEEN
-                                optimized = re.sub(
-                                    rf'\bWHERE\s+{column_name}\s+IN\s*\([^)]+\)',
-                                    f'WHERE {column_name} BETWEEN {numeric_values[0]} AND {numeric_values[-1]}',
-                                    query,
-                                    flags=re.IGNORECASE
-                                )
-                                
+                            if in_column:
+                                # Replace the IN list with BETWEEN; a preceding NOT is kept
+                                operator = 'NOT BETWEEN' if negated else 'BETWEEN'
                                 return (
-                                    f"IN clause contains {len(values)} sequential values - consider using BETWEEN {numeric_values[0]} AND {numeric_values[-1]} for better performance",
-                                    optimized
+                                    f"IN clause contains {len(values)} sequential values - consider using {operator} {low} AND {high} for better performance",
+                                    [(in_start, in_end, f'BETWEEN {low} AND {high}')]
                                 )
-                except (ValueError, IndexError):
+                except ValueError:
                     pass
                 
-                # For non-sequential values, suggest breaking into smaller chunks
-                table_match = re.search(r'\bFROM\s+(\w+)', query, re.IGNORECASE)
-                column_match = re.search(r'\bWHERE\s+(\w+)', query, re.IGNORECASE)
-                if table_match and column_match:
-                    table_name = table_match.group(1)
-                    column_name = column_match.group(1)
+                # For non-sequential values, suggest breaking into smaller chunks.
+                # A UNION of NOT IN chunks would match rows the original excludes.
+                column_name = in_column or ctx.shape.where_col
+                if not negated and ctx.shape.from_tables and column_name:
+                    table_name = ctx.shape.from_tables[0]
                     
                     # Get current SELECT columns or use default
-                    select_match = re.search(r'\bSELECT\s+([^FROM]+)', query, re.IGNORECASE)
-                    if select_match:
-                        select_columns = select_match.group(1).strip()
-                    else:
-                        select_columns = "id, name, email"
+                    select_columns = ctx.shape.select_cols or "id, name, email"
                     
                     # Suggest breaking into smaller chunks
                     chunk_size = 5
                     chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
                     
-                    optimized = f"""-- Break large IN clause into smaller chunks for better performance
--- Option 1: Use UNION of smaller IN clauses
-SELECT {select_columns} FROM {table_name}
-WHERE {column_name} IN ({', '.join(chunks[0])})
-UNION
-SELECT {select_columns} FROM {table_name}
-WHERE {column_name} IN ({', '.join(chunks[1])})
-UNION
-SELECT {select_columns} FROM {table_name}
-WHERE {column_name} IN ({', '.join(chunks[2])})
-ORDER BY name LIMIT 100;
-
--- Option 2: Use EXISTS with a temporary table (for very large datasets)
--- CREATE TEMPORARY TABLE temp_ids (id INT);
--- INSERT INTO temp_ids VALUES {', '.join([f"({v.strip()})" for v in values])};
--- SELECT {select_columns} FROM {table_name} t
--- WHERE EXISTS (SELECT 1 FROM temp_ids ti WHERE ti.id = t.{column_name})
--- ORDER BY name LIMIT 100;"""
+                    select_from = f"SELECT {select_columns} FROM {table_name}\n"
+                    
+                    chunked_query = io.StringIO()
+                    chunked_query.write("-- Break large IN clause into smaller chunks for better performance\n")
+                    chunked_query.write("-- Option 1: Use UNION of smaller IN clauses\n")
+                    for index, chunk in enumerate(chunks):
+                        if index:
+                            chunked_query.write("UNION\n")
+                        chunked_query.write(select_from)
+                        chunked_query.write(f"WHERE {column_name} IN (")
+                        chunked_query.write(', '.join(chunk))
+                        chunked_query.write(")\n")
+                    chunked_query.write("ORDER BY name LIMIT 100;\n\n")
+                    chunked_query.write("-- Option 2: Use EXISTS with a temporary table (for very large datasets)\n")
+                    chunked_query.write("-- CREATE TEMPORARY TABLE temp_ids (id INT);\n")
+                    chunked_query.write("-- INSERT INTO temp_ids VALUES ")
+                    chunked_query.write(', '.join(f"({v})" for v in values))
+                    chunked_query.write(";\n")
+                    chunked_query.write(f"-- {select_from.rstrip()} t\n")
+                    chunked_query.write(f"-- WHERE EXISTS (SELECT 1 FROM temp_ids ti WHERE ti.id = t.{column_name})\n")
+                    chunked_query.write("-- ORDER BY name LIMIT 100;")
                     
+                    # The suggestion replaces the whole query
                     return (
                         f"IN clause contains {len(values)} values - consider breaking into smaller chunks or using BETWEEN if sequential",
-                        optimized
+                        [(0, len(ctx.query), chunked_query.getvalue())]
                     )
                 
                 return (
@@ -245,140 +565,168 @@ ORDER BY name LIMIT 100;
                 )
         return None
     
-    def _rule_order_by_limit(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_order_by_limit(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Suggest adding LIMIT when ORDER BY is used without LIMIT"""
-        if re.search(r'\bORDER\s+BY\b', query, re.IGNORECASE):
-            if not re.search(r'\bLIMIT\b', query, re.IGNORECASE):
+        if ctx.shape.order_by_exists:
+            if not ctx.shape.has_limit:
                 # Add LIMIT clause
-                optimized = query.rstrip(';') + " LIMIT 100;"
+                statement_end = len(ctx.query.rstrip(';'))
                 return (
                     "ORDER BY used without LIMIT - consider adding LIMIT to control result size",
-                    optimized
+                    [(statement_end, len(ctx.query), " LIMIT 100;")]
                 )
         return None
     
-    def _rule_unnecessary_distinct(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_unnecessary_distinct(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Detect potentially unnecessary DISTINCT usage"""
-        if re.search(r'\bDISTINCT\b', query, re.IGNORECASE):
+        if ctx.shape.has_distinct:
             # Check if there's a unique constraint or primary key in WHERE clause
-            if re.search(r'\bWHERE\s+\w+\.\w+\s*=\s*\d+', query, re.IGNORECASE):
+            if ctx.shape.has_where_key_equality:
                 # Remove DISTINCT if it's unnecessary
-                optimized = re.sub(r'\bDISTINCT\s+', '', query, flags=re.IGNORECASE)
                 return (
                     "DISTINCT used with unique constraint - may be unnecessary",
-                    optimized
+                    self._substitute(_DISTINCT_PREFIX_RE, ctx, lambda match: '')
                 )
         return None
     
-    def _rule_table_aliases(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_table_aliases(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Suggest table aliases for complex queries"""
         # Count table references
-        table_refs = re.findall(r'\bFROM\s+(\w+)', query, re.IGNORECASE)
-        table_refs.extend(re.findall(r'\bJOIN\s+(\w+)', query, re.IGNORECASE))
+        table_refs = ctx.shape.table_refs
         
-        if len(table_refs) > 2 and not re.search(r'\bAS\s+\w+', query, re.IGNORECASE):
-            # Add table aliases
-            optimized = query
-            for i, table in enumerate(table_refs):
-                alias = chr(97 + i)  # a, b, c, etc.
-                optimized = re.sub(rf'\b{table}\b', f'{table} AS {alias}', optimized, count=1)
+        if len(table_refs) > 2 and not ctx.shape.has_alias:
+            # Add table aliases right after each FROM/JOIN table name, in query order
+            edits = [
+                (table_end, table_end, f' AS {alias}')
+                for alias, (_, table_end) in zip(_ALIASES, table_refs)
+            ]
             
             return (
                 "Multiple table references detected - consider using table aliases for clarity",
-                optimized
+                edits
             )
         return None
     
-    def _rule_index_hints(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_index_hints(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Suggest index hints for common patterns"""
-        if re.search(r'\bWHERE\s+\w+\s*=\s*\w+', query, re.IGNORECASE):
+        if ctx.shape.has_where_equality_predicate:
             return (
                 "Consider adding appropriate indexes for columns used in WHERE clauses",
                 None
             )
         return None
     
-    def _rule_suggest_additional_columns(self, query: str) -> Optional[Tuple[str, str]]:
+    def _rule_suggest_additional_columns(self, ctx: RuleContext) -> Optional[Tuple[str, Optional[List[Edit]]]]:
         """Suggest additional useful columns that might be missing"""
         # Check if it's a SELECT query (not SELECT *)
-        if re.search(r'\bSELECT\s+(?!\*)(\w+)', query, re.IGNORECASE):
-            table_match = re.search(r'\bFROM\s+(\w+)', query, re.IGNORECASE)
-            if table_match:
-                table_name = table_match.group(1)
-                current_columns = re.search(r'\bSELECT\s+([^FROM]+)', query, re.IGNORECASE)
+        if ctx.shape.select_cols and not ctx.shape.select_star:
+            if ctx.shape.from_tables:
+                table_name = ctx.shape.from_tables[0]
+                current_cols = ctx.shape.select_cols
                 
-                if current_columns:
-                    current_cols = current_columns.group(1).strip()
-                    
-                    # Suggest additional useful columns based on table
-                    if table_name.lower() == 'users':
-                        if 'id' in current_cols and 'name' in current_cols:
-                            # If they have id and name, suggest adding 'number' (phone number)
-                            if 'number' not in current_cols and 'phone' not in current_cols:
-                                # Add number column to the SELECT
-                                optimized = re.sub(
-                                    r'\bSELECT\s+([^FROM]+)',
-                                    r'SELECT \1, number',
-                                    query,
-                                    flags=re.IGNORECASE
-                                )
-                                return (
-                                    "Consider adding 'number' column for complete user information",
-                                    optimized
-                                )
-                    
-                    elif table_name.lower() == 'orders':
-                        if 'id' in current_cols and 'user_id' in current_cols:
-                            if 'total' not in current_cols:
-                                optimized = re.sub(
-                                    r'\bSELECT\s+([^FROM]+)',
-                                    r'SELECT \1, total',
-                                    query,
-                                    flags=re.IGNORECASE
+                # Suggest additional useful columns based on table
+                if table_name.lower() == 'users':
+                    if 'id' in current_cols and 'name' in current_cols:
+                        # If they have id and name, suggest adding 'number' (phone number)
+                        if 'number' not in current_cols and 'phone' not in current_cols:
+                            # Add number column to the SELECT
+                            edits = self._substitute(
+                                _SELECT_COLS_RE, ctx,
+                                lambda match: _SELECT_APPEND_TEMPLATE.format(
+                                    columns=ctx.query[match.start(1):match.end(1)], column='number'
                                 )
-                                return (
-                                    "Consider adding 'total' column for order value information",
-                                    optimized
+                            )
+                            return (
+                                "Consider adding 'number' column for complete user information",
+                                edits
+                            )
+                
+                elif table_name.lower() == 'orders':
+                    if 'id' in current_cols and 'user_id' in current_cols:
+                        if 'total' not in current_cols:
+                            edits = self._substitute(
+                                _SELECT_COLS_RE, ctx,
+                                lambda match: _SELECT_APPEND_TEMPLATE.format(
+                                    columns=ctx.query[match.start(1):match.end(1)], column='total'
                                 )
+                            )
+                            return (
+                                "Consider adding 'total' column for order value information",
+                                edits
+                            )
         
         return None
     
-    def format_query(self, query: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def format_query(query: str) -> str:
         """Format SQL query for better readability"""
+        # sqlparse is only needed here, so it is not loaded on the analysis path
+        import sqlparse
+        
         try:
-            parsed = sqlparse.parse(query)
             return sqlparse.format(query, reindent=True, keyword_case='upper')
         except Exception:
             return query
     
-    def get_query_complexity(self, query: str) -> Dict[str, any]:
+    @staticmethod
+    def get_query_complexity(query: str) -> Dict[str, any]:
         """Analyze query complexity metrics"""
-        try:
-            parsed = parse(query)
-            complexity = {
-                "tables": 0,
-                "joins": 0,
-                "conditions": 0,
-                "subqueries": 0
-            }
-            
-            # Count tables
-            tables = [t for t in parsed.find_all(exp.Table)]
-            complexity["tables"] = len(tables)
-            
-            # Count joins
-            joins = [j for j in parsed.find_all(exp.Join)]
-            complexity["joins"] = len(joins)
-            
-            # Count WHERE conditions
-            where_clauses = [w for w in parsed.find_all(exp.Where)]
-            complexity["conditions"] = len(where_clauses)
-            
-            # Count subqueries
-            subqueries = [s for s in parsed.find_all(exp.Subquery)]
-            complexity["subqueries"] = len(subqueries)
-            
-            return complexity
-            
-        except Exception:
-            return {"error": "Unable to analyze query complexity"} 
\ No newline at end of file
+        return dict(_query_complexity_cached(query))
+    
+    # Optimization rules, applied in order by _apply_optimization_rules
+    _OPTIMIZATION_RULES: ClassVar[Tuple[Callable, ...]] = (
+        _rule_select_star,
+        _rule_missing_where,
+        _rule_in_clause_optimization,
+        _rule_order_by_limit,
+        _rule_unnecessary_distinct,
+        _rule_table_aliases,
+        _rule_index_hints,
+    )
+
+
+@lru_cache(maxsize=2048)
+def _parse_cached(query: str) -> tuple:
+    """Parse a query with sqlglot, sharing the AST between repeated calls"""
+    return tuple(parse(query))
+
+
+@lru_cache(maxsize=4096)
+def _analyze_cached(query: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], str]:
+    """Analyze a normalized query once and keep the result as an immutable tuple"""
+    result = SQLAnalyzer()._analyze(query)
+    return tuple(result["errors"]), tuple(result["warnings"]), result["optimized_query"]
+
+
+@lru_cache(maxsize=1024)
+def _query_complexity_cached(query: str) -> Tuple[Tuple[str, Any], ...]:
+    """Count complexity metrics in one AST walk, kept as immutable (metric, value) pairs"""
+    from sqlglot import exp
+    
+    try:
+        complexity = {
+            "tables": 0,
+            "joins": 0,
+            "conditions": 0,
+            "subqueries": 0
+        }
+        
+        for statement in _parse_cached(query):
+            if statement is None:
+                continue
+            for node, _, _ in statement.walk():
+                if isinstance(node, exp.Table):
+                    complexity["tables"] += 1
+                elif isinstance(node, exp.Join):
+                    complexity["joins"] += 1
+                elif isinstance(node, exp.Where):
+                    # Count WHERE conditions
+                    complexity["conditions"] += 1
+                elif isinstance(node, exp.Subquery):
+                    complexity["subqueries"] += 1
+        
+        return tuple(complexity.items())
+        
+    except Exception:
+        return (("error", "Unable to analyze query complexity"),)
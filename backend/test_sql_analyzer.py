@@ -27,6 +27,15 @@ class TestSQLAnalyzer(unittest.TestCase):
         self.assertGreater(len(result['warnings']), 0)
         self.assertTrue(any('SELECT *' in warning for warning in result['warnings']))
     
+    def test_select_star_suggested_columns(self):
+        """Test suggested columns keep referenced columns first, in query order"""
+        query = "SELECT * FROM orders WHERE status = 'open' ORDER BY created_at"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertTrue(result['optimized_query'].startswith(
+            "SELECT status, created_at, id, user_id, total FROM orders"
+        ))
+    
     def test_missing_where_clause(self):
         """Test detection of DELETE/UPDATE without WHERE"""
         query = "DELETE FROM users"
@@ -35,6 +44,32 @@ class TestSQLAnalyzer(unittest.TestCase):
         self.assertGreater(len(result['warnings']), 0)
         self.assertTrue(any('WHERE' in warning for warning in result['warnings']))
     
+    def test_missing_where_ignores_identifiers_and_comments(self):
+        """Test WHERE inside names or comments doesn't hide a missing WHERE clause"""
+        for query in ("DELETE FROM nowhere_log", "-- WHERE to purge\nDELETE FROM users"):
+            result = self.analyzer.analyze_query(query)
+            self.assertTrue(any('missing WHERE' in warning for warning in result['warnings']), query)
+    
+    def test_missing_where_checks_each_statement(self):
+        """Test DELETE/UPDATE statements after a semicolon or a CTE are checked for WHERE"""
+        for query in ("SELECT id FROM users WHERE id = 1; DELETE FROM users",
+                      "WITH old AS (SELECT id FROM users WHERE id < 5) DELETE FROM users",
+                      "UPDATE users SET name = (SELECT name FROM staff WHERE id = 1)"):
+            result = self.analyzer.analyze_query(query)
+            self.assertTrue(any('missing WHERE' in warning for warning in result['warnings']), query)
+        
+        for query in ("DELETE FROM users WHERE id = 1; SELECT id FROM users",
+                      "WITH old AS (SELECT id FROM users) DELETE FROM users WHERE id IN (SELECT id FROM old)"):
+            result = self.analyzer.analyze_query(query)
+            self.assertFalse(any('missing WHERE' in warning for warning in result['warnings']), query)
+    
+    def test_update_without_where(self):
+        """Test detection of UPDATE ... SET without WHERE"""
+        query = "UPDATE users SET name = 'x'"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertTrue(any('missing WHERE' in warning for warning in result['warnings']))
+    
     def test_large_in_clause(self):
         """Test detection of large IN clauses"""
         query = "SELECT * FROM users WHERE id IN (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15)"
@@ -43,6 +78,61 @@ class TestSQLAnalyzer(unittest.TestCase):
         self.assertGreater(len(result['warnings']), 0)
         self.assertTrue(any('IN clause' in warning for warning in result['warnings']))
     
+    def test_large_in_clause_chunks_every_value(self):
+        """Test the chunked UNION suggestion covers values past the third chunk"""
+        query = "SELECT id FROM users WHERE id IN (3,6,9,12,15,18,21,24,27,30,33,36,39,42,45,48)"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertEqual(result['optimized_query'].count('\nUNION\n'), 3)
+        self.assertIn("WHERE id IN (48)", result['optimized_query'])
+    
+    def test_sequential_in_clause_rewritten_to_between(self):
+        """Test sequential IN values are replaced with BETWEEN"""
+        query = "SELECT id, name FROM users WHERE active = 1 AND id IN (1,2,3,4,5,6,7,8,9,10,11,12)"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertEqual(
+            result['optimized_query'],
+            "SELECT id, name FROM users WHERE active = 1 AND id BETWEEN 1 AND 12"
+        )
+    
+    def test_in_clause_with_duplicates_is_not_sequential(self):
+        """Test repeated IN values are not mistaken for a contiguous range"""
+        query = "SELECT id, name FROM users WHERE id IN (1,1,3,4,5,6,7,8,9,10,11)"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertNotIn('BETWEEN', result['optimized_query'])
+        self.assertTrue(any('11 values' in warning for warning in result['warnings']))
+    
+    def test_not_in_clause_keeps_negation(self):
+        """Test NOT IN lists become NOT BETWEEN and are never chunked into a UNION"""
+        query = "SELECT id FROM t WHERE id NOT IN (1,2,3,4,5,6,7,8,9,10,11)"
+        result = self.analyzer.analyze_query(query)
+        self.assertEqual(result['optimized_query'], "SELECT id FROM t WHERE id NOT BETWEEN 1 AND 11")
+        
+        query = "SELECT id FROM t WHERE id NOT IN (1,3,5,7,9,11,13,15,17,19,21)"
+        result = self.analyzer.analyze_query(query)
+        self.assertEqual(result['optimized_query'], query)
+        self.assertTrue(any('IN clause' in warning for warning in result['warnings']))
+    
+    def test_rule_edits_are_combined(self):
+        """Test independent rule edits land in one optimized query"""
+        query = "SELECT * FROM users WHERE id IN (1,2,3,4,5,6,7,8,9,10,11,12) ORDER BY name"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertEqual(
+            result['optimized_query'],
+            "SELECT id, name, email, number FROM users WHERE id BETWEEN 1 AND 12 ORDER BY name LIMIT 100;"
+        )
+    
+    def test_conflicting_rule_sees_earlier_rewrite(self):
+        """Test a whole-query rewrite is built from the earlier rules' output"""
+        query = "SELECT * FROM users WHERE id IN (1,3,5,7,9,11,13,15,17,19,21)"
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertIn("SELECT id, name, email, number FROM users\nWHERE id IN (1, 3, 5, 7, 9)",
+                      result['optimized_query'])
+    
     def test_order_by_without_limit(self):
         """Test detection of ORDER BY without LIMIT"""
         query = "SELECT * FROM users ORDER BY name"
@@ -51,6 +141,58 @@ class TestSQLAnalyzer(unittest.TestCase):
         self.assertGreater(len(result['warnings']), 0)
         self.assertTrue(any('ORDER BY' in warning for warning in result['warnings']))
     
+    def test_query_shape(self):
+        """Test the single-pass query shape used by the rules"""
+        query = "SELECT id, 'FROM x' FROM users u JOIN orders o ON u.id = o.user_id WHERE name = 'a' ORDER BY id"
+        shape = self.analyzer._scan(query)
+        
+        self.assertEqual(shape.select_cols, "id, 'FROM x'")
+        self.assertEqual(shape.from_tables, ['users'])
+        self.assertEqual(shape.join_tables, ['orders'])
+        self.assertEqual(shape.where_col, 'name')
+        self.assertTrue(shape.order_by_exists)
+        self.assertFalse(shape.has_limit)
+        self.assertFalse(shape.select_star)
+    
+    def test_where_equality_flags(self):
+        """Test the WHERE equality flags read by the index hint and DISTINCT rules"""
+        self.assertTrue(self.analyzer._scan("SELECT id FROM users WHERE id = 1").has_where_equality_predicate)
+        self.assertFalse(self.analyzer._scan("SELECT id FROM users WHERE id > 1").has_where_equality_predicate)
+        self.assertFalse(self.analyzer._scan("SELECT id FROM users ORDER BY id").has_where_equality_predicate)
+        
+        shape = self.analyzer._scan("SELECT DISTINCT u.id FROM users u WHERE u.id = 7")
+        self.assertTrue(shape.has_where_key_equality)
+        self.assertFalse(shape.has_where_equality_predicate)
+    
+    def test_table_aliases(self):
+        """Test aliases are added after each FROM/JOIN table only"""
+        query = ("SELECT users.id FROM users JOIN orders ON users.id = orders.user_id "
+                 "JOIN products ON products.id = orders.product_id")
+        result = self.analyzer.analyze_query(query)
+        
+        self.assertEqual(
+            result['optimized_query'],
+            "SELECT users.id FROM users AS a JOIN orders AS b ON users.id = orders.user_id "
+            "JOIN products AS c ON products.id = orders.product_id"
+        )
+    
+    def test_suggest_additional_columns(self):
+        """Test the whole SELECT list is kept when appending a column"""
+        query = "SELECT id, name, email FROM users WHERE id = 1"
+        ctx = self.analyzer._rule_context(query)
+        warning, edits = self.analyzer._rule_suggest_additional_columns(ctx)
+        optimized = self.analyzer._apply_edits(query, edits)
+        
+        self.assertIn("'number'", warning)
+        self.assertEqual(optimized, "SELECT id, name, email, number FROM users WHERE id = 1")
+        
+        # Lower-case input keeps its case outside the rewritten span
+        query = "select id, name from users"
+        ctx = self.analyzer._rule_context(query)
+        _, edits = self.analyzer._rule_suggest_additional_columns(ctx)
+        optimized = self.analyzer._apply_edits(query, edits)
+        self.assertEqual(optimized, "SELECT id, name, number from users")
+    
     def test_invalid_sql_syntax(self):
         """Test handling of invalid SQL syntax"""
         query = "SELECT FROM users WHERE id = 1"
@@ -58,6 +200,24 @@ class TestSQLAnalyzer(unittest.TestCase):
         
         self.assertGreater(len(result['errors']), 0)
     
+    def test_structural_syntax_errors(self):
+        """Test malformed queries are rejected before the sqlglot parse"""
+        for query in ("SELECT * FROM users WHERE id IN (1, 2",
+                      "SELECT id FROM users WHERE"):
+            result = self.analyzer.analyze_query(query)
+            self.assertEqual(len(result['errors']), 1, query)
+        
+        # Parentheses inside string literals are not counted
+        result = self.analyzer.analyze_query("SELECT id FROM users WHERE name = '('")
+        self.assertEqual(result['errors'], [])
+    
+    def test_uncommon_statement_starts_are_parsed(self):
+        """Test statements with any leading word are left to the sqlglot parse"""
+        for query in ("PRAGMA table_info(users)", "CALL proc()", "FROM users SELECT id"):
+            self.assertEqual(self.analyzer.analyze_query(query)['errors'], [], query)
+        
+        self.assertEqual(len(self.analyzer.analyze_query("users WHERE id = 1")['errors']), 1)
+    
     def test_empty_query(self):
         """Test handling of empty query"""
         query = ""
@@ -66,6 +226,34 @@ class TestSQLAnalyzer(unittest.TestCase):
         # Should handle gracefully without crashing
         self.assertIsInstance(result, dict)
     
+    def test_analysis_cache_normalizes_whitespace(self):
+        """Test queries differing only in whitespace share a cached analysis"""
+        first = self.analyzer.analyze_query("SELECT *\nFROM   products")
+        hits = self.analyzer.cache_info().hits
+        second = self.analyzer.analyze_query("SELECT * FROM products")
+        
+        self.assertEqual(self.analyzer.cache_info().hits, hits + 1)
+        self.assertEqual(first, second)
+        
+        # Each caller gets its own mutable lists
+        first['warnings'].append('extra')
+        self.assertNotIn('extra', self.analyzer.analyze_query("SELECT * FROM products")['warnings'])
+    
+    def test_unchanged_query_keeps_its_layout(self):
+        """Test a query no rule rewrites is returned with its original line breaks"""
+        query = "SELECT id, name\nFROM users\nWHERE active = 1"
+        result = self.analyzer.analyze_query("  " + query + "\n")
+        
+        self.assertEqual(result['optimized_query'], query)
+    
+    def test_analysis_cache_keeps_literal_whitespace(self):
+        """Test whitespace inside string literals and quoted names is not collapsed"""
+        query = "SELECT id FROM users WHERE name = 'a    b'"
+        self.assertEqual(self.analyzer.analyze_query(query)['optimized_query'], query)
+        
+        query = 'SELECT "full  name" FROM users WHERE note = \'--\''
+        self.assertEqual(self.analyzer.analyze_query(query)['optimized_query'], query)
+    
     def test_query_formatting(self):
         """Test SQL query formatting"""
         query = "select id,name from users where id=1"
@@ -84,6 +272,14 @@ class TestSQLAnalyzer(unittest.TestCase):
         self.assertIn('joins', complexity)
         self.assertIn('conditions', complexity)
         self.assertIn('subqueries', complexity)
+        self.assertEqual(complexity['tables'], 2)
+        self.assertEqual(complexity['joins'], 1)
+        self.assertEqual(complexity['conditions'], 1)
+        self.assertEqual(complexity['subqueries'], 0)
+        
+        # Cached results are not shared with callers
+        complexity['tables'] = 99
+        self.assertEqual(self.analyzer.get_query_complexity(query)['tables'], 2)
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file